@@ -1,161 +1,819 @@
 ########################## app.py ####################################
 
 import os
+import asyncio
+import contextlib
+import copy
+import functools
+import hashlib
+import io
+import itertools
+import re
 import time
+import httpx
+import orjson
 import requests
 import arxiv
 from bs4 import BeautifulSoup
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:  # selectolax is optional; bs4 remains the fallback
+    HTMLParser = None
 import torch
+import torch.nn.functional as F
 import streamlit as st
 from huggingface_hub import InferenceClient
 from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers.modeling_outputs import CausalLMOutputWithCrossAttentions
+from transformers.pytorch_utils import Conv1D
 
 # --- Configuration ---
 MAX_INPUT_LENGTH = 1024  # GPT-2's maximum context size
+MAX_PROMPT_LENGTH = MAX_INPUT_LENGTH - 256  # Leave room in the context for generation
 MAX_SEARCH_RESULTS = 2
 MAX_BODY_LENGTH = 2000
+# Fixed prompt/generation shape buckets: every request is padded to one of
+# two prompt lengths and one of three generation budgets, capping the
+# torch.compile shape matrix instead of recompiling per prompt length
+PROMPT_BUCKETS = (512, MAX_PROMPT_LENGTH)
+GEN_BUCKETS = (128, 256, 512)
+
+# Dynamic int8 quantization of linear layers: ~2-3x faster CPU matmuls.
+# Disable with LITREV_INT8=0 if output quality degrades.
+QUANTIZE_INT8 = os.environ.get("LITREV_INT8", "1") == "1"
+
+# bfloat16 weights + autocast where the CPU has native bf16 GEMMs
+# (AVX-512-BF16). Opt-in via LITREV_BF16=1; mutually exclusive with int8.
+USE_BF16 = os.environ.get("LITREV_BF16", "0") == "1"
+
+# Sampling parameters (match the previous model.generate settings)
+TEMPERATURE = 0.8
+TOP_K = 50
+TOP_P = 0.95
 
 # --- Force CPU usage ---
 device = torch.device('cpu')
-print(f"[INFO] Using device: {device}")
 
 # --- Model Loading with Error Handling ---
-try:
-    model = AutoModelForCausalLM.from_pretrained("gpt2").to(device)
-    tokenizer = AutoTokenizer.from_pretrained("gpt2")
-    tokenizer.pad_token = tokenizer.eos_token  # Set padding token
-    print("[SUCCESS] Model and tokenizer loaded successfully")
-except Exception as e:
-    st.error(f"Failed to load model: {str(e)}")
-    raise SystemExit("Critical error - cannot continue without model")
+@st.cache_resource(show_spinner="Loading GPT-2 model...")
+def _load_model():
+    """Load model and tokenizer once per server process"""
+    _tune_cpu_threads()
+    try:
+        model = AutoModelForCausalLM.from_pretrained("gpt2").to(device)
+        model.eval()
+        tokenizer = AutoTokenizer.from_pretrained("gpt2", use_fast=True)
+        tokenizer.pad_token = tokenizer.eos_token  # Set padding token
+        tokenizer.padding_side = "left"  # Decoder-only models must pad on the left
+        model = _maybe_cast_bf16(model)
+        model = _maybe_quantize(model)
+        gen_model = _compile_model(model, tokenizer)
+        print(f"[SUCCESS] Model and tokenizer loaded successfully on {device}")
+        return model, tokenizer, gen_model
+    except Exception as e:
+        st.error(f"Failed to load model: {str(e)}")
+        raise SystemExit("Critical error - cannot continue without model")
+
+_threads_tuned = False
+
+def _tune_cpu_threads():
+    """Max out intra-op parallelism for the dense matmuls; single inter-op pool.
+
+    Must run exactly once: a second set_num_interop_threads call raises
+    once any parallel work has started, e.g. after an importlib.reload
+    during development.
+    """
+    global _threads_tuned
+    if _threads_tuned:
+        return
+    try:
+        torch.set_num_threads(os.cpu_count() or 1)
+        torch.set_num_interop_threads(1)
+    except Exception as e:
+        print(f"[WARN] Thread tuning skipped: {str(e)}")
+    _threads_tuned = True
+
+def _bf16_supported() -> bool:
+    """True when the CPU has native AVX-512-BF16 GEMM kernels"""
+    try:
+        return bool(torch.cpu._is_avx512_bf16_supported())
+    except Exception:
+        return False
+
+def _maybe_cast_bf16(model):
+    """Cast weights to bfloat16 where supported, keeping layernorms in fp32"""
+    if not USE_BF16:
+        return model
+    if not _bf16_supported():
+        print("[WARN] LITREV_BF16 set but CPU lacks AVX-512-BF16; keeping fp32")
+        return model
+    model = model.to(torch.bfloat16)
+    for module in model.modules():
+        if isinstance(module, torch.nn.LayerNorm):
+            module.float()  # Layernorm reductions are precision-sensitive
+    print("[INFO] bfloat16 weights enabled")
+    return model
+
+def _conv1d_to_linear(module) -> int:
+    """Recursively replace HF Conv1D modules with equivalent nn.Linear.
+
+    quantize_dynamic only converts module types present in its default
+    mapping, which Conv1D is not — and Conv1D is GPT-2's entire hot path
+    (c_attn/c_proj/c_fc in every block). Conv1D computes x @ W + b with W
+    of shape (in, out), so a Linear carrying the transposed weight is
+    numerically identical. Returns the number of modules replaced.
+    """
+    converted = 0
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features)
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+            converted += 1
+        else:
+            converted += _conv1d_to_linear(child)
+    return converted
+
+def _maybe_quantize(model):
+    """Apply dynamic int8 quantization to the linear layers when enabled"""
+    if not QUANTIZE_INT8:
+        return model
+    if next(model.parameters()).dtype == torch.bfloat16:
+        return model  # bf16 and int8 paths are mutually exclusive
+    try:
+        converted = _conv1d_to_linear(model)
+        # GPT-2 has 4 Conv1D modules in each of its 12 blocks
+        if converted < 48:
+            raise RuntimeError(f"expected ~48 Conv1D conversions, got {converted}")
+        quantized = torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        n_quantized = sum(
+            isinstance(m, torch.ao.nn.quantized.dynamic.Linear) for m in quantized.modules()
+        )
+        if n_quantized < converted:
+            raise RuntimeError(
+                f"only {n_quantized} of {converted}+ linear layers were quantized"
+            )
+        print(f"[INFO] Dynamic int8 quantization applied to {n_quantized} linear layers")
+        return quantized
+    except Exception as e:
+        print(f"[WARN] Quantization failed, using fp32 model: {str(e)}")
+        return model
+
+def _to_legacy_kv(past_key_values):
+    """Normalize a Cache object to the legacy tuple-of-(k, v) format"""
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return past_key_values
+
+class GPT2Step(torch.nn.Module):
+    """Trace-friendly wrapper: flat tensor inputs and outputs around one
+    decode step. Full torch.jit.script of GPT-2 fails, so trace only."""
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, position_ids, *flat_past):
+        past = tuple(
+            (flat_past[i], flat_past[i + 1]) for i in range(0, len(flat_past), 2)
+        )
+        # position_ids must be a traced tensor input: the model would
+        # otherwise derive it from the past length, a Python int the tracer
+        # bakes in as a constant from the dummy example
+        out = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            past_key_values=past,
+            use_cache=True
+        )
+        flat = [t for layer in _to_legacy_kv(out.past_key_values) for t in layer]
+        return (out.logits, *flat)
+
+class _TracedStepModel:
+    """Presents the HF calling convention on top of a traced step module.
+
+    Single-token decode steps go through the traced graph; prompt-length
+    forwards (variable arity, no past) stay on the eager model.
+    """
+    def __init__(self, model, traced_step):
+        self.model = model
+        self.traced_step = traced_step
+
+    def __call__(self, input_ids, attention_mask=None, position_ids=None,
+                 past_key_values=None, use_cache=True):
+        if past_key_values is None or input_ids.shape[1] != 1 or position_ids is None:
+            out = self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=past_key_values,
+                use_cache=use_cache
+            )
+            out.past_key_values = _to_legacy_kv(out.past_key_values)
+            return out
+        flat_past = [t for layer in _to_legacy_kv(past_key_values) for t in layer]
+        outputs = self.traced_step(input_ids, attention_mask, position_ids, *flat_past)
+        logits, flat = outputs[0], outputs[1:]
+        past = tuple((flat[i], flat[i + 1]) for i in range(0, len(flat), 2))
+        return CausalLMOutputWithCrossAttentions(logits=logits, past_key_values=past)
+
+def _trace_step_model(model, tokenizer):
+    """torch.jit.trace fallback for the decode step when compile is unavailable.
+
+    Tracing 'succeeds' even when past-length-dependent values got baked in
+    as constants, so before adopting the traced module its logits are
+    checked against eager at a past length different from the one traced;
+    any divergence drops this rung.
+    """
+    def step_inputs(past_len):
+        prompt = torch.full((1, past_len), tokenizer.eos_token_id, dtype=torch.long, device=device)
+        with torch.inference_mode():
+            warm = model(input_ids=prompt, use_cache=True)
+        flat_past = [t for layer in _to_legacy_kv(warm.past_key_values) for t in layer]
+        ids = prompt[:, -1:]
+        mask = torch.ones((1, past_len + 1), dtype=torch.long, device=device)
+        position_ids = torch.tensor([[past_len]], dtype=torch.long, device=device)
+        return ids, mask, position_ids, flat_past
+
+    dummy_ids, dummy_mask, dummy_pos, flat_past = step_inputs(8)
+    with torch.inference_mode():
+        traced = torch.jit.trace(
+            GPT2Step(model), (dummy_ids, dummy_mask, dummy_pos, *flat_past), strict=False
+        )
+
+        # Validate at a past length the trace never saw
+        check_ids, check_mask, check_pos, check_past = step_inputs(16)
+        traced_logits = traced(check_ids, check_mask, check_pos, *check_past)[0]
+        eager_logits = model(
+            input_ids=check_ids,
+            attention_mask=check_mask,
+            position_ids=check_pos,
+            past_key_values=tuple(
+                (check_past[i], check_past[i + 1]) for i in range(0, len(check_past), 2)
+            ),
+            use_cache=True
+        ).logits
+        if not torch.allclose(traced_logits, eager_logits, rtol=1e-3, atol=1e-4):
+            raise RuntimeError("traced decode step diverges from eager at an unseen past length")
+
+    print("[INFO] torch.jit.trace fallback enabled for decode steps")
+    return _TracedStepModel(model, traced)
+
+def _compile_model(model, tokenizer):
+    """Compile the prompt forward, falling back to a traced decode step and
+    finally to eager on failure.
+
+    Only the prompt forward has a stable shape (the bucketed prompt on top
+    of the prefix KV). Per-token decode steps grow the mask and past every
+    step, which under dynamic=False would recompile until torch._dynamo's
+    limit and then run eager anyway — so they never go through the
+    compiled module (see ReportAgent._generate).
+    """
+    try:
+        compiled = torch.compile(model, mode="reduce-overhead", dynamic=False)
+        # Warm up with the exact shapes production uses: the prefix KV plus a
+        # dummy prompt for every pad bucket, so the one-off compile cost for
+        # each graph is paid at load time instead of on a user's click
+        prefix_ids = tokenizer(PROMPT_PREFIX, add_special_tokens=False, return_tensors="pt").input_ids.to(device)
+        prefix_len = prefix_ids.shape[1]
+        with torch.inference_mode():
+            prefix_out = model(input_ids=prefix_ids, use_cache=True)
+            for bucket in PROMPT_BUCKETS:
+                dummy = torch.full((1, bucket - prefix_len), tokenizer.eos_token_id,
+                                   dtype=torch.long, device=device)
+                mask = torch.ones((1, bucket), dtype=torch.long, device=device)
+                position_ids = (mask.cumsum(-1) - 1)[:, -dummy.shape[1]:]
+                compiled(
+                    input_ids=dummy,
+                    attention_mask=mask,
+                    position_ids=position_ids,
+                    # A forward extends the cache in place, so each bucket
+                    # gets its own copy of the pristine prefix KV
+                    past_key_values=copy.deepcopy(prefix_out.past_key_values),
+                    use_cache=True
+                )
+        print("[INFO] torch.compile warm-up complete")
+        return compiled
+    except Exception as e:
+        print(f"[WARN] torch.compile unavailable, trying jit.trace: {str(e)}")
+    try:
+        return _trace_step_model(model, tokenizer)
+    except Exception as e:
+        # GPT-2 is known to resist scripting; tracing can fail too
+        print(f"[WARN] torch.jit.trace failed, using eager model: {str(e)}")
+        return model
+
+# The fixed pieces of the report prompt; the variable parts are tokenized
+# per request and spliced between them
+PROMPT_PREFIX = "Write a literature review about: "
+PROMPT_GOOGLE_HEADER = "\nGoogle Results: "
+PROMPT_ARXIV_HEADER = "\nArxiv Papers: "
+PROMPT_SUFFIX = "\nRequirements: Formal tone, synthesize key findings, reference Hayek at the end.\n"
+
+STREAM_EVERY = 8  # Decode steps between streaming updates to the UI
+PROMPT_CHAR_BUDGET = 4000  # Cap on the human-readable prompt copy
+
+# Token budgets for the two result sections; the remainder of the prompt
+# budget is left for the topic and the fixed fragments
+GOOGLE_TOKEN_BUDGET = 400
+ARXIV_TOKEN_BUDGET = 400
+
+def _pack_results(tokenizer, results: list, budget: int) -> str:
+    """Format results as '- title: snippet' lines within a token budget.
+
+    str(results) wasted most of the context window on dict syntax; this
+    packs whole entries until the budget would be exceeded.
+    """
+    lines = []
+    remaining = budget
+    for result in results:
+        snippet = result.get('snippet') or result.get('abstract') or "No snippet"
+        line = f"- {result.get('title', 'No title')}: {snippet}\n"
+        cost = len(tokenizer(line, add_special_tokens=False).input_ids)
+        if cost > remaining:
+            break
+        lines.append(line)
+        remaining -= cost
+    return ''.join(lines)
+
+@st.cache_resource
+def _prompt_fragment_ids():
+    """Token ids for the constant prompt fragments, encoded once per process"""
+    _, tokenizer, _ = _load_model()
+    def encode(fragment):
+        return tokenizer(fragment, add_special_tokens=False, return_tensors="pt").input_ids
+    return {
+        "prefix": encode(PROMPT_PREFIX),
+        "google": encode(PROMPT_GOOGLE_HEADER),
+        "arxiv": encode(PROMPT_ARXIV_HEADER),
+        "suffix": encode(PROMPT_SUFFIX),
+    }
+
+@st.cache_resource
+def _prompt_prefix_kv():
+    """Attention KV for the constant prompt prefix, computed once per process.
+
+    Every prompt starts with the same prefix tokens, so their keys/values
+    are cached here and each request only forwards the variable remainder.
+    Runs on the eager model: it happens once, and the prefix-only shape
+    would otherwise compile a graph nothing else uses.
+    """
+    model, _, _ = _load_model()
+    prefix_ids = _prompt_fragment_ids()["prefix"].to(device)
+    with torch.inference_mode():
+        out = model(input_ids=prefix_ids, use_cache=True)
+    return out.past_key_values
+
+def _sample_token(logits):
+    """Top-k / top-p sampling of the next token from the last-step logits"""
+    top_vals, top_idx = torch.topk(logits / TEMPERATURE, TOP_K)
+    probs = F.softmax(top_vals, dim=-1)  # Already sorted descending by topk
+    cumulative = torch.cumsum(probs, dim=-1)
+    keep = cumulative - probs < TOP_P  # Always keeps the most likely token
+    probs = torch.where(keep, probs, torch.zeros_like(probs))
+    choice = torch.multinomial(probs, num_samples=1)
+    return top_idx.gather(-1, choice)
+
+def _pad_to_bucket(input_ids, attention_mask, pad_id, reserved: int = 0):
+    """Left-pad so reserved + prompt length lands on a PROMPT_BUCKETS boundary"""
+    length = input_ids.shape[1]
+    target = next((b for b in PROMPT_BUCKETS if length + reserved <= b), MAX_PROMPT_LENGTH) - reserved
+    if target > length:
+        pad = torch.full((1, target - length), pad_id, dtype=input_ids.dtype, device=input_ids.device)
+        input_ids = torch.cat([pad, input_ids], dim=1)
+        attention_mask = torch.cat([torch.zeros_like(pad), attention_mask], dim=1)
+    return input_ids, attention_mask
+
+def _bucket_new_tokens(available: int) -> int:
+    """Round the generation budget down to the largest GEN_BUCKETS entry that fits"""
+    for bucket in reversed(GEN_BUCKETS):
+        if bucket <= available:
+            return bucket
+    return max(available, 0)
+
+# --- Bounded string assembly ---
+def _limit(s: str, max_len: int) -> str:
+    """Cap a string at max_len chars; no-op (and no copy) when under budget"""
+    return s if len(s) <= max_len else s[:max_len]
+
+def _bounded_write(buf: io.StringIO, s: str, max_len: int) -> int:
+    """Write at most max_len chars of s into buf, returning the chars written"""
+    if max_len <= 0:
+        return 0
+    s = _limit(s, max_len)
+    buf.write(s)
+    return len(s)
+
+# --- Search Result Caching ---
+CACHE_DIR = os.path.expanduser("~/.cache/litrev")
+ARXIV_CACHE_TTL = 24 * 3600  # arXiv updates once a day
+GOOGLE_CACHE_TTL = 6 * 3600
+
+def _cache_path(namespace: str, query: str, max_results: int) -> str:
+    key = hashlib.sha1(f"{query}|{max_results}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, namespace, f"{key}.json")
+
+def _cache_get(namespace: str, query: str, max_results: int, ttl: int):
+    """Return cached results if a fresh entry exists, else None"""
+    path = _cache_path(namespace, query, max_results)
+    try:
+        if time.time() - os.stat(path).st_mtime < ttl:
+            with open(path, "rb") as f:
+                return orjson.loads(f.read())
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[WARN] Cache read failed: {str(e)}")
+    return None
+
+def _cache_put(namespace: str, query: str, max_results: int, results: list):
+    try:
+        path = _cache_path(namespace, query, max_results)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(results))
+    except Exception as e:
+        print(f"[WARN] Cache write failed: {str(e)}")
 
 # --- Enhanced Search Functions ---
-def google_search(query: str, num_results: int = MAX_SEARCH_RESULTS) -> list:
-    """Safe Google search with error handling and input validation"""
+MAX_BODY_BYTES = 256_000  # Only this much of a page can ever reach the parser
+
+class RateLimiter:
+    """Token-bucket limiter: bursts pass immediately, pacing kicks in only
+    once the burst budget is spent, instead of a flat sleep per call.
+
+    Holds no loop-bound primitives: these singletons outlive the fresh
+    event loop each Streamlit click creates with asyncio.run, where an
+    asyncio.Lock would bind to the first loop and break every later one.
+    Token accounting happens synchronously (the loop is single-threaded),
+    with the balance going negative to queue up waiters; only the sleep
+    itself is awaited.
+    """
+    def __init__(self, rate_per_sec: float, burst: int):
+        self.rate = rate_per_sec
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _reserve(self) -> float:
+        """Take one token and return the wait owed (0 when a burst token was free)"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1.0
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+GOOGLE_LIMITER = RateLimiter(rate_per_sec=4, burst=4)
+ARXIV_LIMITER = RateLimiter(rate_per_sec=1, burst=2)
+
+def _make_http_client() -> httpx.AsyncClient:
+    """Pooled HTTP client: keep-alive (and HTTP/2 where available) lets the
+    SERP fetch and every per-result body fetch reuse the same sockets"""
+    try:
+        return httpx.AsyncClient(
+            http2=True,
+            timeout=5,
+            headers={"User-Agent": "Mozilla/5.0", "Accept-Encoding": "gzip, deflate, br"},
+            limits=httpx.Limits(max_keepalive_connections=16),
+            follow_redirects=True
+        )
+    except ImportError:  # http2 extra (h2) not installed
+        return httpx.AsyncClient(
+            timeout=5,
+            headers={"User-Agent": "Mozilla/5.0", "Accept-Encoding": "gzip, deflate, br"},
+            limits=httpx.Limits(max_keepalive_connections=16),
+            follow_redirects=True
+        )
+
+_TOKEN_RE = re.compile(r"\S+")
+# Script/style blocks (whose text is not page content) and all other tags
+_TAG_RE = re.compile(r"<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->|<[^>]+>",
+                     re.IGNORECASE | re.DOTALL)
+
+def _extract_body(html: str) -> str:
+    """Strip tags and return the first MAX_BODY_LENGTH words of a page.
+
+    We only need a flat word preview here, so a single regex pass replaces
+    building a DOM; the structured parser is reserved for the SERP, where
+    selectors are actually needed.
+    """
+    text = _TAG_RE.sub(" ", html)
+    # Bounded scan instead of text.split()[:N], which materializes every token
+    tokens = (m.group(0) for m in _TOKEN_RE.finditer(text))
+    return ' '.join(itertools.islice(tokens, MAX_BODY_LENGTH))
+
+def _parse_serp(serp_html: str, num_results: int) -> list:
+    """Extract (title, link, snippet) triples from the Google results page"""
+    parsed = []
+    if HTMLParser is not None:
+        tree = HTMLParser(serp_html)
+        for node in tree.css("div.tF2Cxc")[:num_results]:
+            try:
+                title_node = node.css_first("h3")
+                link_node = node.css_first("a")
+                snippet_node = node.css_first("span.aCOpRe")
+                title = title_node.text() if title_node else "No title"
+                link = link_node.attributes.get("href", "#") if link_node else "#"
+                snippet = snippet_node.text() if snippet_node else "No snippet"
+                parsed.append((title, link, snippet))
+            except Exception as result_error:
+                print(f"[WARN] Failed to process search result: {str(result_error)}")
+        return parsed
+
+    soup = BeautifulSoup(serp_html, "lxml")
+    for g in soup.find_all('div', class_='tF2Cxc')[:num_results]:
+        try:
+            title = g.find('h3').text if g.find('h3') else "No title"
+            link = g.find('a')['href'] if g.find('a') else "#"
+            snippet = g.find('span', class_='aCOpRe').text if g.find('span', class_='aCOpRe') else "No snippet"
+            parsed.append((title, link, snippet))
+        except Exception as result_error:
+            print(f"[WARN] Failed to process search result: {str(result_error)}")
+    return parsed
+
+async def _fetch_page_body(client: httpx.AsyncClient, link: str) -> str:
+    """Safe page body fetch, streamed and capped at MAX_BODY_BYTES.
+
+    We only ever keep the first MAX_BODY_LENGTH words, so downloading and
+    parsing a multi-megabyte page is wasted work: the read aborts once the
+    cap is reached and non-HTML responses are skipped outright.
+    """
+    body = ""
+    try:
+        await GOOGLE_LIMITER.acquire()
+        chunks = []
+        total = 0
+        async with client.stream("GET", link) as page:
+            content_type = page.headers.get("content-type", "text/html")
+            if "html" not in content_type and "text" not in content_type:
+                return ""
+            async for chunk in page.aiter_bytes(65536):
+                chunks.append(chunk)
+                total += len(chunk)
+                if total > MAX_BODY_BYTES:
+                    break
+        html = b"".join(chunks).decode(page.charset_encoding or "utf-8", errors="ignore")
+        # CPU-heavy parse runs in a worker thread so other fetches keep flowing
+        body = await asyncio.to_thread(_extract_body, html)
+    except Exception as e:
+        print(f"[WARN] Content fetch failed: {str(e)}")
+    return body
+
+async def google_search_async(query: str, num_results: int = MAX_SEARCH_RESULTS,
+                              client: httpx.AsyncClient = None) -> list:
+    """Safe Google search with error handling and concurrent page fetches"""
+    cached = _cache_get("google", query, num_results, GOOGLE_CACHE_TTL)
+    if cached is not None:
+        return cached
+
     search_results = []
-    
+    owns_client = client is None
+    if owns_client:
+        client = _make_http_client()
+
     try:
         search_url = f"https://www.google.com/search?q={requests.utils.quote(query)}"
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(search_url, headers=headers, timeout=10)
+
+        await GOOGLE_LIMITER.acquire()
+        response = await client.get(search_url, timeout=10)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        results = soup.find_all('div', class_='tF2Cxc')[:num_results]
+        parsed = await asyncio.to_thread(_parse_serp, response.text, num_results)
 
-        for g in results:
-            try:
-                title = g.find('h3').text if g.find('h3') else "No title"
-                link = g.find('a')['href'] if g.find('a') else "#"
-                snippet = g.find('span', class_='aCOpRe').text if g.find('span', class_='aCOpRe') else "No snippet"
+        # Fetch all result pages concurrently instead of one at a time
+        bodies = await asyncio.gather(
+            *[_fetch_page_body(client, link) for _, link, _ in parsed],
+            return_exceptions=True
+        )
 
-                # Safe content fetching
+        for (title, link, snippet), body in zip(parsed, bodies):
+            if isinstance(body, Exception):
                 body = ""
-                try:
-                    page = requests.get(link, timeout=5)
-                    page_soup = BeautifulSoup(page.text, "html.parser")
-                    text = page_soup.get_text(separator=" ", strip=True)
-                    body = ' '.join(text.split()[:MAX_BODY_LENGTH])
-                except Exception as e:
-                    print(f"[WARN] Content fetch failed: {str(e)}")
-
-                search_results.append({
-                    "title": title[:200],  # Limit title length
-                    "link": link,
-                    "snippet": snippet[:500],  # Limit snippet length
-                    "body": body[:MAX_BODY_LENGTH]
-                })
-                time.sleep(1)  # Rate limiting
-
-            except Exception as result_error:
-                print(f"[WARN] Failed to process search result: {str(result_error)}")
+            search_results.append({
+                "title": _limit(title, 200),
+                "link": link,
+                "snippet": _limit(snippet, 500),
+                "body": _limit(body, MAX_BODY_LENGTH)
+            })
 
     except Exception as search_error:
         print(f"[ERROR] Google search failed: {str(search_error)}")
-    
+    finally:
+        if owns_client:
+            await client.aclose()
+
+    if search_results:  # Never cache a failed search
+        _cache_put("google", query, num_results, search_results)
+
     return search_results
 
-def arxiv_search(query: str, max_results: int = MAX_SEARCH_RESULTS) -> list:
+@functools.lru_cache(maxsize=256)
+def _arxiv_search_blocking(query: str, max_results: int, _ttl_bucket: int = 0) -> list:
+    """Blocking arXiv client iteration, run off the event loop.
+
+    Identical queries within a day return identical results, so entries are
+    memoized in memory and persisted to disk with a 24-hour TTL.
+    _ttl_bucket rolls over every ARXIV_CACHE_TTL seconds, expiring the memo
+    entry so the disk TTL is consulted again instead of serving the first
+    fetch forever (the cached team pins this module for the server's life).
+    """
+    cached = _cache_get("arxiv", query, max_results, ARXIV_CACHE_TTL)
+    if cached is not None:
+        return cached
+
+    results = []
+    client = arxiv.Client()
+    search = arxiv.Search(
+        query=query,
+        max_results=max_results,
+        sort_by=arxiv.SortCriterion.Relevance
+    )
+
+    for paper in client.results(search):
+        results.append({
+            "title": _limit(paper.title, 300),
+            "authors": [_limit(author.name, 50) for author in paper.authors][:5],  # Limit authors
+            "published": paper.published.strftime("%Y-%m-%d") if paper.published else "Unknown",
+            "abstract": _limit(paper.summary, 1000) if paper.summary else "No abstract",
+            "pdf_url": paper.pdf_url if paper.pdf_url else "#"
+        })
+
+    if results:  # Never cache a failed search
+        _cache_put("arxiv", query, max_results, results)
+
+    return results
+
+async def arxiv_search_async(query: str, max_results: int = MAX_SEARCH_RESULTS) -> list:
     """Safe Arxiv search with error handling"""
     results = []
-    
+
     try:
-        client = arxiv.Client()
-        search = arxiv.Search(
-            query=query,
-            max_results=max_results,
-            sort_by=arxiv.SortCriterion.Relevance
+        # Pace our own calls to arXiv; the blocking iterator then runs off
+        # the event loop so Google fetches can overlap it
+        await ARXIV_LIMITER.acquire()
+        results = await asyncio.to_thread(
+            _arxiv_search_blocking, query, max_results,
+            int(time.time() // ARXIV_CACHE_TTL)
         )
-
-        for paper in client.results(search):
-            results.append({
-                "title": paper.title[:300],  # Limit title length
-                "authors": [author.name[:50] for author in paper.authors][:5],  # Limit authors
-                "published": paper.published.strftime("%Y-%m-%d") if paper.published else "Unknown",
-                "abstract": paper.summary[:1000] if paper.summary else "No abstract",
-                "pdf_url": paper.pdf_url if paper.pdf_url else "#"
-            })
-            time.sleep(1)  # Rate limiting
-            
     except Exception as e:
         print(f"[ERROR] Arxiv search failed: {str(e)}")
-    
+
     return results
 
 # --- Robust Agents with Input Validation ---
 class GoogleSearchAgent:
-    def run(self, topic):
-        print(f"[Google Search Agent] Searching for: {topic[:50]}...")  # Truncate long queries
-        safe_topic = topic[:100]  # Limit query length
-        return google_search(safe_topic), f"Google search for: {safe_topic}"
+    async def run(self, topic, client: httpx.AsyncClient = None):
+        print(f"[Google Search Agent] Searching for: {_limit(topic, 50)}...")  # Truncate long queries
+        safe_topic = _limit(topic, 100)  # Limit query length
+        return await google_search_async(safe_topic, client=client), f"Google search for: {safe_topic}"
 
 class ArxivSearchAgent:
-    def run(self, topic):
-        print(f"[Arxiv Search Agent] Searching for: {topic[:50]}...")
-        safe_topic = topic[:100]  # Limit query length
-        return arxiv_search(safe_topic), f"Arxiv search for: {safe_topic}"
+    async def run(self, topic):
+        print(f"[Arxiv Search Agent] Searching for: {_limit(topic, 50)}...")
+        safe_topic = _limit(topic, 100)  # Limit query length
+        return await arxiv_search_async(safe_topic), f"Arxiv search for: {safe_topic}"
 
 class ReportAgent:
-    def run(self, topic, google_results, arxiv_results):
+    def __init__(self):
+        self.model, self.tokenizer, self.gen_model = _load_model()
+        # Per-token steps run eager: their shapes change every step, which
+        # the static-shape compiled module cannot serve without recompiling.
+        # The traced-step fallback, however, exists exactly for those steps.
+        self.step_model = (
+            self.gen_model if isinstance(self.gen_model, _TracedStepModel) else self.model
+        )
+        self.bf16 = next(self.model.parameters()).dtype == torch.bfloat16
+
+    def _generate(self, input_ids, attention_mask, max_new_tokens, past_key_values=None,
+                  on_token=None):
+        """KV-cached decode loop: forward the prompt once, then one token per step.
+
+        Avoids model.generate's growing input_ids reallocation and per-step
+        Python overhead; inference_mode also skips autograd version tracking.
+        When past_key_values is given, input_ids holds only the tokens after
+        the cached span and attention_mask covers the cached span too.
+        on_token, when set, receives the decoded text generated so far every
+        few steps so the UI can render the review as it is written.
+        """
+        out_ids = torch.empty((1, max_new_tokens), dtype=torch.long, device=input_ids.device)
+        autocast = (
+            torch.autocast(device_type='cpu', dtype=torch.bfloat16)
+            if self.bf16 else contextlib.nullcontext()
+        )
+
+        # Positions must come from the mask cumsum: the pads sitting between
+        # the cached prefix and the prompt do not advance positions, but a
+        # direct model(...) call would count them via the past length
+        position_ids = (attention_mask.long().cumsum(-1) - 1).clamp(min=0)
+        position_ids = position_ids[:, -input_ids.shape[1]:]
+
+        with torch.inference_mode(), autocast:
+            out = self.gen_model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                past_key_values=past_key_values,
+                use_cache=True
+            )
+            next_position = position_ids[:, -1:] + 1
+            for step in range(max_new_tokens):
+                next_token = _sample_token(out.logits[:, -1, :])
+                out_ids[0, step] = next_token[0, 0]
+                if next_token.item() == self.tokenizer.eos_token_id:
+                    return out_ids[:, :step + 1]
+                if on_token is not None and step % STREAM_EVERY == STREAM_EVERY - 1:
+                    on_token(self.tokenizer.decode(out_ids[0, :step + 1], skip_special_tokens=True))
+                attention_mask = torch.cat([attention_mask, attention_mask.new_ones((1, 1))], dim=1)
+                out = self.step_model(
+                    input_ids=next_token,
+                    attention_mask=attention_mask,
+                    position_ids=next_position,
+                    past_key_values=out.past_key_values,
+                    use_cache=True
+                )
+                next_position = next_position + 1
+
+        return out_ids
+
+    def run(self, topic, google_results, arxiv_results, on_token=None):
         print("[Report Agent] Generating report...")
         
         # Safe prompt construction
-        truncated_topic = topic[:200]
-        safe_google = str(google_results)[:1500]  # Limit context size
-        safe_arxiv = str(arxiv_results)[:1500]
-        
-        prompt = f"""Write a literature review about: {truncated_topic}
-        Google Results: {safe_google}
-        Arxiv Papers: {safe_arxiv}
-        Requirements: Formal tone, synthesize key findings, reference Hayek at the end.
-        """
-        
+        truncated_topic = _limit(topic, 200)
+        safe_google = _pack_results(self.tokenizer, google_results, GOOGLE_TOKEN_BUDGET)
+        safe_arxiv = _pack_results(self.tokenizer, arxiv_results, ARXIV_TOKEN_BUDGET)
+
+        # Human-readable copy of the prompt, kept for the UI expander,
+        # assembled once into a bounded buffer
+        buf = io.StringIO()
+        remaining = PROMPT_CHAR_BUDGET
+        for part in (PROMPT_PREFIX, truncated_topic,
+                     PROMPT_GOOGLE_HEADER, safe_google,
+                     PROMPT_ARXIV_HEADER, safe_arxiv,
+                     PROMPT_SUFFIX):
+            remaining -= _bounded_write(buf, part, remaining)
+        prompt = buf.getvalue()
+
         try:
-            # Safe tokenization with truncation
-            inputs = tokenizer(
-                prompt,
-                return_tensors="pt",
-                max_length=MAX_INPUT_LENGTH,
-                truncation=True,
-                padding=True
-            ).to(device)
+            # Tokenize only the variable substrings; the constant fragments
+            # were encoded once at startup and the prefix's KV is precomputed
+            fragments = _prompt_fragment_ids()
+            def encode(part):
+                return self.tokenizer(part, add_special_tokens=False, return_tensors="pt").input_ids
+            prefix_ids = fragments["prefix"].to(device)
+            prefix_len = prefix_ids.shape[1]
+            # Truncate only the middle (topic + results) and splice the
+            # requirements suffix on afterwards: when the sections fill their
+            # budgets, truncating from the end would silently drop the only
+            # instruction text in the prompt
+            suffix_ids = fragments["suffix"]
+            middle_budget = MAX_PROMPT_LENGTH - prefix_len - suffix_ids.shape[1]
+            middle_ids = torch.cat([
+                encode(truncated_topic),
+                fragments["google"], encode(safe_google),
+                fragments["arxiv"], encode(safe_arxiv),
+            ], dim=1)[:, :middle_budget]
+            variable_ids = torch.cat([middle_ids, suffix_ids], dim=1).to(device)
+            variable_ids, variable_mask = _pad_to_bucket(
+                variable_ids, torch.ones_like(variable_ids),
+                self.tokenizer.eos_token_id, reserved=prefix_len
+            )
+            # Mask covers cached prefix + (padded) variable part
+            attention_mask = torch.cat([torch.ones_like(prefix_ids), variable_mask], dim=1)
+
+            # The cache object is extended in place during decoding, so hand
+            # the loop a copy and keep the cached prefix KV pristine
+            prefix_kv = copy.deepcopy(_prompt_prefix_kv())
 
             # Safe generation with output checks
-            with torch.no_grad():
-                outputs = model.generate(
-                    **inputs,
-                    max_length=min(1500, MAX_INPUT_LENGTH),
-                    num_return_sequences=1,
-                    do_sample=True,
-                    top_k=50,
-                    top_p=0.95,
-                    temperature=0.8,
-                    pad_token_id=tokenizer.eos_token_id
-                )
+            # Scale the generation budget with the amount of evidence, so a
+            # sparse result set does not pay for a full-length review
+            evidence_budget = min(512, 64 * (len(google_results) + len(arxiv_results)))
+            new_ids = self._generate(
+                variable_ids,
+                attention_mask,
+                max_new_tokens=_bucket_new_tokens(
+                    min(MAX_INPUT_LENGTH - attention_mask.shape[1], evidence_budget)
+                ),
+                past_key_values=prefix_kv,
+                on_token=on_token
+            )
+            outputs = torch.cat([prefix_ids, variable_ids, new_ids], dim=1)
 
             if outputs.shape[1] > 0:
-                text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-                text = text[:5000]  # Limit output length
+                text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+                text = _limit(text, 5000)  # Limit output length
             else:
                 text = "Failed to generate review - empty output"
                 
@@ -172,21 +830,38 @@ class LiteratureReviewTeam:
         self.arxiv_agent = ArxivSearchAgent()
         self.report_agent = ReportAgent()
 
-    def conduct_review(self, topic):
+    async def conduct_review(self, topic, on_token=None):
         try:
-            google_results, google_prompt = self.google_agent.run(topic)
-            arxiv_results, arxiv_prompt = self.arxiv_agent.run(topic)
-            
+            # Both searches are network-bound, so overlap them completely on
+            # one pooled HTTP client
+            async with _make_http_client() as http_client:
+                (google_results, google_prompt), (arxiv_results, arxiv_prompt) = await asyncio.gather(
+                    self.google_agent.run(topic, client=http_client),
+                    self.arxiv_agent.run(topic)
+                )
+
             # Validate results before passing to report agent
             if not isinstance(google_results, list):
                 google_results = []
             if not isinstance(arxiv_results, list):
                 arxiv_results = []
-                
+
+            # Nothing to synthesize: skip the expensive generate entirely
+            if not google_results and not arxiv_results:
+                return {
+                    'google_prompt': google_prompt,
+                    'arxiv_prompt': arxiv_prompt,
+                    'report_prompt': '',
+                    'google_results': [],
+                    'arxiv_results': [],
+                    'literature_review': "No sources found - please refine the topic."
+                }
+
             report, report_prompt = self.report_agent.run(
-                topic[:200],  # Truncate long topics
+                _limit(topic, 200),  # Truncate long topics
                 google_results[:MAX_SEARCH_RESULTS],  # Enforce max results
-                arxiv_results[:MAX_SEARCH_RESULTS]
+                arxiv_results[:MAX_SEARCH_RESULTS],
+                on_token=on_token
             )
             
             return {
@@ -205,6 +880,11 @@ class LiteratureReviewTeam:
                 'literature_review': "Failed to generate review due to system error"
             }
 
+@st.cache_resource
+def get_team():
+    """Share one team (and its loaded model) across Streamlit reruns"""
+    return LiteratureReviewTeam()
+
 # --- Streamlit UI with Safe Rendering ---
 def main():
     st.title("📚 Robust Literature Review Generator")
@@ -218,9 +898,17 @@ def main():
             return
             
         with st.spinner("Conducting safe review process..."):
-            team = LiteratureReviewTeam()
-            result = team.conduct_review(topic)
-            
+            team = get_team()
+
+            # Stream the review draft into a placeholder while it generates,
+            # instead of blocking silently until the whole pipeline is done
+            stream_placeholder = st.empty()
+            def on_token(partial_text):
+                stream_placeholder.markdown(f"*Drafting review...*\n\n{partial_text}")
+
+            result = asyncio.run(team.conduct_review(topic, on_token=on_token))
+            stream_placeholder.empty()
+
             if 'error' in result:
                 st.error(result['error'])
                 return